@@ -1,16 +1,202 @@
-from flask import Flask, render_template_string, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template_string, request, send_from_directory
 from flask_cors import CORS
+from flask_compress import Compress
 import os
 import sys
 import traceback
 import json
+import re
+import hashlib
+import threading
+import numpy as np
+import orjson
+from cachetools import TTLCache
 
 # Import your existing LLM chat functionality
-from llm_chat import hybrid_answer, get_db_connection  # Import connection function instead of con
+from llm_chat import (  # Import connection function instead of con
+    hybrid_answer, get_session, get_db_connection, get_embedding_model,
+    extract_entities, update_context, is_time_sensitive
+)
 
 app = Flask(__name__)
 CORS(app)
 
+def fast_json(payload, status=200):
+    """orjson-encoded JSON response (drop-in for jsonify, emits bytes directly)"""
+    return app.response_class(
+        orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
+# gzip responses (the chat page alone is ~15KB of inline CSS/JS)
+app.config['COMPRESS_MIN_SIZE'] = 512
+Compress(app)
+
+# Shared DuckDB connection; each request gets its own lightweight cursor
+CON = get_db_connection()
+
+# /api/stats only changes when the CSVs are reloaded, so serve it from memory
+STATS_TTL_SECONDS = 60
+_stats_cache = TTLCache(maxsize=1, ttl=STATS_TTL_SECONDS)
+_stats_lock = threading.Lock()
+
+MAX_SESSION_ID_LENGTH = 64
+
+# Answer cache: exact message hash first, then paraphrase match on query embeddings.
+# Entries are scoped to the session context they were answered in, and a paraphrase
+# only matches when it names the same float / region / parameter.
+ANSWER_CACHE_SIZE = 1024
+ANSWER_CACHE_TTL_SECONDS = 3600
+SEMANTIC_HIT_THRESHOLD = 0.97
+_answer_cache = TTLCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL_SECONDS)
+_query_keys = []
+_query_tags = []
+_query_vecs = None
+_cache_lock = threading.Lock()  # TTLCache isn't thread-safe; guards it and the _query_* index
+
+
+_SYNONYMS = {
+    'max': 'maximum',
+    'min': 'minimum',
+    'temp': 'temperature',
+    'temps': 'temperature',
+    'sal': 'salinity',
+    'pres': 'pressure',
+}
+_SYNONYM_RE = re.compile(r'\b(' + '|'.join(_SYNONYMS) + r')\b')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def canonicalize_question(message):
+    """Normalize case, spacing, trailing punctuation and common abbreviations"""
+    text = _WHITESPACE_RE.sub(' ', message.lower()).strip(' .?!')
+    return _SYNONYM_RE.sub(lambda m: _SYNONYMS[m.group(1)], text)
+
+
+def session_context_key(state):
+    """The parts of a session that change what an answer means"""
+    return (state.current_float_id, state.current_region, state.current_parameter)
+
+
+def _answer_key(message, context):
+    return hashlib.sha256(repr((message, context)).encode('utf-8')).hexdigest()
+
+
+def _query_tag(message, context):
+    """Semantic hits need the same context and the same entities (embeddings barely see digits)"""
+    return context, tuple(sorted(extract_entities(message).items()))
+
+
+def is_cacheable(message):
+    """Follow-ups lean on session context and time-sensitive answers go stale"""
+    if is_time_sensitive(message):
+        return False
+    return not any(token in FOLLOW_UP_WORDS for token in _TOKEN_RE.findall(message.lower()))
+
+
+def _embed_message(message):
+    """Unit-length query embedding, or None if the embedder is unavailable"""
+    try:
+        vec = np.asarray(get_embedding_model().embed_query(message), dtype=np.float32)
+    except Exception as e:
+        print(f"Warning: answer cache embedding failed: {e}")
+        return None
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def lookup_cached_answer(message, context):
+    """Return (cached response or None, query embedding for a later store / retrieval)"""
+    with _cache_lock:
+        cached = _answer_cache.get(_answer_key(message, context))
+    if cached is not None:
+        return cached, None
+
+    vec = _embed_message(message)
+    if vec is None:
+        return None, None
+    tag = _query_tag(message, context)
+    with _cache_lock:
+        candidates = [i for i, t in enumerate(_query_tags) if t == tag]
+        if candidates:
+            scores = _query_vecs[candidates] @ vec
+            best = int(np.argmax(scores))
+            if scores[best] >= SEMANTIC_HIT_THRESHOLD:
+                cached = _answer_cache.get(_query_keys[candidates[best]])
+    return cached, vec
+
+
+def store_cached_answer(message, context, response, vec):
+    """Remember an answer under its exact key and, if given, its query embedding"""
+    global _query_vecs
+    key = _answer_key(message, context)
+    tag = _query_tag(message, context) if vec is not None else None
+    with _cache_lock:
+        _answer_cache[key] = response
+        if vec is None:
+            return
+        _query_keys.append(key)
+        _query_tags.append(tag)
+        _query_vecs = vec[None, :] if _query_vecs is None else np.vstack([_query_vecs, vec])
+        if len(_query_keys) > ANSWER_CACHE_SIZE:
+            del _query_keys[0]
+            del _query_tags[0]
+            _query_vecs = _query_vecs[1:]
+
+# Early exit for greetings and off-topic chatter, before any RAG / LLM work
+TRIVIAL_RE = re.compile(r'^(hi|hello|hey|thanks?|thank you|bye|goodbye)\W*$', re.I)
+CANNED_RESPONSES = {
+    'greeting': "Hello! Ask me anything about the Argo float data - floats, cycles, locations, temperature, salinity or pressure.",
+    'thanks': "You're welcome! Let me know if you have more questions about the Argo float data.",
+    'bye': "Goodbye! Come back any time to explore the Argo float data.",
+    'off_topic': "I can only help with Argo float data. Try asking about floats, cycles, locations, temperature, salinity or pressure measurements.",
+}
+DOMAIN_KEYWORDS = {
+    'argo', 'float', 'floats', 'ocean', 'sea', 'data', 'dataset', 'database', 'measurement',
+    'profile', 'cycle', 'temperature', 'salinity', 'pressure', 'depth', 'deep', 'deepest',
+    'oxygen', 'chlorophyll', 'ph', 'latitude', 'longitude', 'location', 'position', 'region',
+    'arctic', 'pacific', 'atlantic', 'indian', 'southern', 'mediterranean', 'arabian',
+    'warm', 'warmest', 'cold', 'coldest', 'plot', 'graph', 'chart', 'trend', 'variation',
+}
+# Follow-ups like "show me more about it" lean on session context, not keywords
+FOLLOW_UP_WORDS = {'it', 'its', 'this', 'that', 'these', 'those', 'they', 'them', 'more', 'same', 'previous', 'again'}
+_TOKEN_RE = re.compile(r'[a-z]+|\d+')
+
+
+def _load_schema_terms():
+    """Table and column name parts, e.g. PROFILE_PSAL_QC -> profile, psal, qc"""
+    try:
+        rows = CON.cursor().execute(
+            "SELECT table_name, column_name FROM information_schema.columns"
+        ).fetchall()
+    except Exception as e:
+        print(f"Warning: could not load schema terms: {e}")
+        return set()
+    return {part for row in rows for name in row for part in name.lower().split('_') if part}
+
+
+SCHEMA_TERMS = _load_schema_terms() | DOMAIN_KEYWORDS
+
+
+def classify_trivial(message):
+    """Return a CANNED_RESPONSES key for messages that need no LLM, else None"""
+    match = TRIVIAL_RE.match(message)
+    if match:
+        word = match.group(1).lower()
+        if word.startswith('thank'):
+            return 'thanks'
+        if word in ('bye', 'goodbye'):
+            return 'bye'
+        return 'greeting'
+
+    for token in _TOKEN_RE.findall(message.lower()):
+        if token.isdigit() or token in FOLLOW_UP_WORDS:
+            return None
+        if token in SCHEMA_TERMS or token.rstrip('s') in SCHEMA_TERMS:
+            return None
+    return 'off_topic'
+
 # Store the HTML template
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -370,6 +556,15 @@ HTML_TEMPLATE = """
                 this.chatInput = document.getElementById('chatInput');
                 this.sendButton = document.getElementById('sendButton');
                 
+                // One conversation per tab: the server keeps context per session id
+                this.sessionId = sessionStorage.getItem('argoSessionId');
+                if (!this.sessionId) {
+                    this.sessionId = (window.crypto && crypto.randomUUID)
+                        ? crypto.randomUUID()
+                        : Date.now().toString(36) + Math.random().toString(36).slice(2);
+                    sessionStorage.setItem('argoSessionId', this.sessionId);
+                }
+                
                 this.initializeEventListeners();
             }
             
@@ -401,7 +596,7 @@ HTML_TEMPLATE = """
                         headers: {
                             'Content-Type': 'application/json',
                         },
-                        body: JSON.stringify({ message: message })
+                        body: JSON.stringify({ message: message, session_id: this.sessionId })
                     });
                     
                     const data = await response.json();
@@ -496,32 +691,60 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# The template is static, so render it once instead of on every page load
+with app.app_context():
+    RENDERED_HOME = render_template_string(HTML_TEMPLATE)
+HOME_CACHE_CONTROL = 'public, max-age=86400'
+
 @app.route('/')
 def home():
     """Serve the main chat interface"""
-    return render_template_string(HTML_TEMPLATE)
+    return Response(RENDERED_HOME, mimetype='text/html',
+                    headers={'Cache-Control': HOME_CACHE_CONTROL})
 
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages and return responses"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
-        if not data or 'message' not in data:
-            return jsonify({'error': 'No message provided'}), 400
+        if not data or not isinstance(data.get('message'), str):
+            return fast_json({'error': 'No message provided'}, 400)
         
         user_message = data['message'].strip()
         if not user_message:
-            return jsonify({'error': 'Empty message'}), 400
+            return fast_json({'error': 'Empty message'}, 400)
         
         print(f"User question: {user_message}")  # Debug logging
         
-        # Use your existing hybrid_answer function
-        response = hybrid_answer(user_message)
+        # Serve repeated / paraphrased questions from cache, else run the full pipeline
+        cache_text = canonicalize_question(user_message)
+        trivial = classify_trivial(cache_text)
+        if trivial:
+            return fast_json({
+                'response': CANNED_RESPONSES[trivial],
+                'status': 'success'
+            })
+        
+        session_id = data.get('session_id')
+        if not isinstance(session_id, str) or not 0 < len(session_id) <= MAX_SESSION_ID_LENGTH:
+            session_id = 'default'
+        session = get_session(session_id)
+        if is_cacheable(cache_text):
+            context = session_context_key(session)  # before hybrid_answer moves it on
+            response, query_vec = lookup_cached_answer(cache_text, context)
+            if response is None:
+                # Retrieval reuses the lookup's embedding instead of embedding the question again
+                response = hybrid_answer(user_message, session, embedding=query_vec)
+                store_cached_answer(cache_text, context, response, query_vec)
+            else:
+                update_context(user_message, session)  # a cache hit still advances the session
+        else:
+            response = hybrid_answer(user_message, session)
         
         print(f"LLM response: {response}")  # Debug logging
         
-        return jsonify({
+        return fast_json({
             'response': response,
             'status': 'success'
         })
@@ -529,37 +752,43 @@ def chat():
     except Exception as e:
         print(f"Error in chat endpoint: {str(e)}")
         print(traceback.format_exc())
-        return jsonify({
+        return fast_json({
             'error': f'Internal server error: {str(e)}',
             'status': 'error'
-        }), 500
+        }, 500)
 
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
     try:
-        # Test database connection
-        con = get_db_connection()
-        test_query = "SELECT COUNT(*) as count FROM floats LIMIT 1"
-        result = con.execute(test_query).fetchone()
-        con.close()
-        
-        return jsonify({
+        # Liveness ping plus catalog row estimate (no table scan)
+        con = CON.cursor()
+        con.execute("SELECT 1").fetchone()
+        result = con.execute(
+            "SELECT estimated_size FROM duckdb_tables() WHERE table_name = 'floats'"
+        ).fetchone()
+        
+        return fast_json({
             'status': 'healthy',
             'database': 'connected',
             'floats_available': result[0] if result else 0
         })
     except Exception as e:
-        return jsonify({
+        return fast_json({
             'status': 'unhealthy',
             'error': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/api/stats')
 def get_stats():
     """Get basic statistics about the dataset"""
+    with _stats_lock:
+        stats = _stats_cache.get('stats')  # single get: the entry can expire between `in` and `[]`
+    if stats is not None:
+        return fast_json(stats)
+
     try:
-        con = get_db_connection()
+        con = CON.cursor()
         stats = {}
         
         # Get float count
@@ -574,11 +803,12 @@ def get_stats():
         result = con.execute("SELECT COUNT(*) as cycle_count FROM cycles").fetchone()
         stats['total_cycles'] = result[0] if result else 0
         
-        con.close()
-        return jsonify(stats)
+        with _stats_lock:
+            _stats_cache['stats'] = stats
+        return fast_json(stats)
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return fast_json({'error': str(e)}, 500)
 
 if __name__ == '__main__':
     print("🚀 Starting Argo Float Chatbot Server...")
@@ -586,10 +816,8 @@ if __name__ == '__main__':
     
     try:
         # Test your existing setup
-        con = get_db_connection()
-        test_result = con.execute("SELECT COUNT(*) FROM floats LIMIT 1").fetchone()
+        test_result = CON.cursor().execute("SELECT COUNT(*) FROM floats LIMIT 1").fetchone()
         print(f"✅ Database connected! Found floats table with {test_result[0]} records")
-        con.close()
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         sys.exit(1)
@@ -1,58 +1,298 @@
 # build_vectordb.py
 import os
+import json
+import queue
+import functools
+import threading
 import duckdb
-import pandas as pd
+import chromadb
+import numpy as np
+import torch
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from config import DUCKDB_PATH, VECTOR_DB_PATH
 
+COLLECTION_NAME = "cycles"
+# 384-d MiniLM: ~2x faster to embed than mpnet and half the index size. Changing this
+# forces a rebuild (see built_with_model), since stored vector dims must match.
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# int8 dynamically-quantized ONNX export shipped in the model repo (CPU query path)
+ONNX_QUANTIZED_FILE = "onnx/model_quint8_avx2.onnx"
+ADD_CHUNK_SIZE = 5000
+INT8_INDEX_FILE = "cycles_int8.npz"
+META_FILE = "cycles_meta.parquet"
+# Written last by a successful build; its absence means "rebuild"
+BUILD_STAMP_FILE = "build_complete.json"
+
+
+def quantize_int8(embs):
+    """Per-vector symmetric int8 quantization -> (codes, scales); v ~= codes * scale"""
+    scales = np.abs(embs).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(embs / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class FlatCycleIndex:
+    """Exact cosine search over every cycle vector with a single BLAS mat-vec.
+
+    For tens of thousands of cycles this is faster and more accurate than HNSW.
+    """
+
+    def __init__(self, matrix, texts, metadatas, embedding):
+        self.matrix = matrix
+        self.texts = texts
+        self.metadatas = metadatas
+        self.embedding = embedding
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        q = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        scores = self.matrix @ q
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Document(page_content=self.texts[i], metadata=self.metadatas[i]) for i in top]
+
+    def similarity_search(self, query, k=4):
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k)
+
+
+def load_flat_index(embedding):
+    """Load the int8 sidecar as a normalized fp32 matrix; None if it was never built"""
+    index_path = os.path.join(VECTOR_DB_PATH, INT8_INDEX_FILE)
+    meta_path = os.path.join(VECTOR_DB_PATH, META_FILE)
+    if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+        return None
+
+    with np.load(index_path) as data:
+        matrix = data["codes"].astype(np.float32) * data["scales"][:, None]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    metadatas = pq.read_table(meta_path).to_pylist()
+    if len(metadatas) != len(matrix):
+        print(f"⚠️ Flat index sidecars disagree ({len(matrix)} vectors, {len(metadatas)} rows); using Chroma")
+        return None
+    texts = [meta.pop("document") for meta in metadatas]
+    return FlatCycleIndex(matrix, texts, metadatas, embedding)
+
+
+def format_cycle_texts(cols):
+    """Contextual embedding text for each row of a batch of cycle columns"""
+    return [
+        f"Float {fid} | Profile {prof} | "
+        f"Cycle {cyc} | Date: {juld} | "
+        f"Location: ({lat}, {lon}) | "
+        f"Position QC: {pos_qc} | Direction: {direction} | "
+        f"Data Mode: {mode} | "
+        f"Pressure QC: {pres_qc} | "
+        f"Temperature QC: {temp_qc} | "
+        f"Salinity QC: {psal_qc}"
+        for (fid, prof, cyc, juld, lat, lon, pos_qc, direction, mode,
+             pres_qc, temp_qc, psal_qc) in zip(*cols.values())
+    ]
+
+
+def cycle_metadatas(cols):
+    """Per-row metadata dicts for one batch, built only when that batch is written"""
+    names = list(cols)
+    return [dict(zip(names, row)) for row in zip(*cols.values())]
+
+
+_DONE = object()
+
+
+def _drain(q):
+    """Consume a pipeline queue up to its sentinel so upstream puts never block"""
+    while q.get() is not _DONE:
+        pass
+
+
+def run_embedding_pipeline(reader, encoder, collection, meta_writer):
+    """Overlap text building, embedding and Chroma writes across three stages.
+
+    A producer thread pulls Arrow record batches from DuckDB and formats their
+    texts, an embedder thread encodes them and the calling thread writes each
+    batch to Chroma and to the parquet sidecar, so throughput is bounded by the
+    slowest stage rather than the sum of all three, and the cycles table is
+    never materialized in full.
+    Returns (int8 codes, scales) per batch, in row order.
+    """
+    q_texts = queue.Queue(maxsize=4)
+    q_embs = queue.Queue(maxsize=4)
+    errors = []
+
+    def produce():
+        try:
+            offset = 0
+            for batch in reader:
+                cols = batch.to_pydict()
+                ids = [str(i) for i in range(offset, offset + batch.num_rows)]
+                offset += batch.num_rows
+                q_texts.put((ids, format_cycle_texts(cols), cycle_metadatas(cols), batch))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            q_texts.put(_DONE)
+
+    def embed():
+        # Identical texts (e.g. null-heavy rows) are encoded once and scattered back
+        known = {}
+        try:
+            while (item := q_texts.get()) is not _DONE:
+                ids, chunk, metas, batch = item
+                new_texts = list(dict.fromkeys(t for t in chunk if t not in known))
+                if new_texts:
+                    new_embs = encoder.encode(
+                        new_texts, batch_size=256, convert_to_numpy=True,
+                        normalize_embeddings=True, show_progress_bar=False
+                    ).astype(np.float32)
+                    known.update(zip(new_texts, new_embs))
+                embs = np.stack([known[t] for t in chunk])
+                q_embs.put((ids, embs, chunk, metas, batch))
+        except Exception as e:
+            errors.append(e)
+            _drain(q_texts)
+        finally:
+            q_embs.put(_DONE)
+
+    workers = [threading.Thread(target=produce, daemon=True),
+               threading.Thread(target=embed, daemon=True)]
+    for worker in workers:
+        worker.start()
+
+    codes, scales = [], []
+    try:
+        while (item := q_embs.get()) is not _DONE:
+            ids, embs, chunk, metas, batch = item
+            collection.add(ids=ids, embeddings=embs.tolist(), documents=chunk, metadatas=metas)
+            meta_writer(pa.Table.from_batches([batch]).append_column("document", pa.array(chunk)))
+            chunk_codes, chunk_scales = quantize_int8(embs)
+            codes.append(chunk_codes)
+            scales.append(chunk_scales)
+    except Exception:
+        _drain(q_embs)
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+    if errors:
+        raise errors[0]
+    return codes, scales
+
+
+@functools.lru_cache(maxsize=1)
+def get_embedder():
+    """Load the sentence-transformer once per process and reuse it across builds"""
+    # Batched encode on GPU (fp16) when available, CPU fp32 otherwise
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    embeddings = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={"device": device},
+        encode_kwargs={"batch_size": 256, "normalize_embeddings": True}
+    )
+    if device == "cuda":
+        torch.backends.cuda.matmul.allow_tf32 = True
+        embeddings.client.half()
+    return embeddings
+
+
+def built_with_model(path=VECTOR_DB_PATH):
+    """Embedding model of the last *completed* build (None if missing, unknown or interrupted)"""
+    try:
+        with open(os.path.join(path, BUILD_STAMP_FILE), encoding="utf-8") as f:
+            return json.load(f).get("embedding_model")
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
 # --- Build Vector DB ---
-def build_vector_db():
-    # Connect to DuckDB
-    con = duckdb.connect(DUCKDB_PATH)
+def build_vector_db(embedding_model=None, con=None):
+    # Connect to DuckDB (read-only), or read through the caller's connection/cursor;
+    # DuckDB refuses a second handle on the same file with a different config
+    con = con or duckdb.connect(DUCKDB_PATH, read_only=True)
 
-    # Load all cycle-level info
-    df_cycles = con.execute("""
-        SELECT FLOAT_ID, PROFILE_NUMBER, CYCLE_NUMBER, JULD, LATITUDE, LONGITUDE,
+    # Stream cycle-level info as Arrow record batches (columnar, no pandas round-trip)
+    reader = con.execute("""
+        SELECT FLOAT_ID, PROFILE_NUMBER, CYCLE_NUMBER, CAST(JULD AS VARCHAR) AS JULD, LATITUDE, LONGITUDE,
                POSITION_QC, DIRECTION, DATA_MODE,
                PROFILE_PRES_QC, PROFILE_TEMP_QC, PROFILE_PSAL_QC
         FROM cycles
-    """).df()
-
-    # Build contextual texts for embeddings
-    texts = df_cycles.apply(
-        lambda row: (
-            f"Float {row['FLOAT_ID']} | Profile {row['PROFILE_NUMBER']} | "
-            f"Cycle {row['CYCLE_NUMBER']} | Date: {row['JULD']} | "
-            f"Location: ({row['LATITUDE']}, {row['LONGITUDE']}) | "
-            f"Position QC: {row['POSITION_QC']} | Direction: {row['DIRECTION']} | "
-            f"Data Mode: {row['DATA_MODE']} | "
-            f"Pressure QC: {row['PROFILE_PRES_QC']} | "
-            f"Temperature QC: {row['PROFILE_TEMP_QC']} | "
-            f"Salinity QC: {row['PROFILE_PSAL_QC']}"
-        ),
-        axis=1
-    ).tolist()
-
-    # Metadata for filtering / retrieval
-    metadatas = df_cycles.to_dict(orient="records")
-
-    # --- Initialize FREE HuggingFace embeddings ---
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-mpnet-base-v2"  # world-class free model
-    )
+    """).fetch_record_batch(rows_per_batch=ADD_CHUNK_SIZE)
+
+    # --- FREE HuggingFace embeddings (caller's model, else the cached one) ---
+    embeddings = embedding_model or get_embedder()
+
+    # Write straight into a persistent collection, embedding chunk by chunk
+    client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
 
-    # Build Chroma vector DB
-    vectordb = Chroma.from_texts(
-        texts=texts,
-        embedding=embeddings,
-        metadatas=metadatas,
-        persist_directory=VECTOR_DB_PATH
+    # Full rebuild: drop the completion stamp and the old sidecars first, so a crash
+    # midway leaves "no index" rather than old vectors paired with new metadata
+    stamp_path = os.path.join(VECTOR_DB_PATH, BUILD_STAMP_FILE)
+    index_path = os.path.join(VECTOR_DB_PATH, INT8_INDEX_FILE)
+    meta_path = os.path.join(VECTOR_DB_PATH, META_FILE)
+    for path in (stamp_path, index_path, meta_path):
+        _remove_if_exists(path)
+    try:
+        client.delete_collection(COLLECTION_NAME)
+    except Exception:
+        pass
+    collection = client.get_or_create_collection(
+        COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
     )
 
-    
+    # Texts + metadata for the flat index, appended one batch at a time to a temp file
+    meta_writer = None
+    meta_tmp_path = meta_path + ".tmp"
 
-    vectordb.persist()
+    def write_meta(table):
+        nonlocal meta_writer
+        if meta_writer is None:
+            meta_writer = pq.ParquetWriter(meta_tmp_path, table.schema)
+        meta_writer.write_table(table)
+
+    try:
+        codes, scales = run_embedding_pipeline(reader, embeddings.client, collection, write_meta)
+    finally:
+        if meta_writer is not None:
+            meta_writer.close()
+        con.close()
+
+    # Compact int8 copy of the vectors (Chroma itself only stores fp32); both sidecars
+    # are renamed into place only once complete
+    if codes:
+        index_tmp_path = index_path + ".tmp"
+        with open(index_tmp_path, "wb") as f:
+            np.savez(f, codes=np.concatenate(codes), scales=np.concatenate(scales))
+        os.replace(index_tmp_path, index_path)
+        os.replace(meta_tmp_path, meta_path)
+
+    with open(stamp_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"embedding_model": EMBEDDING_MODEL_NAME}, f)
+    os.replace(stamp_path + ".tmp", stamp_path)
+
+    vectordb = Chroma(
+        client=client,
+        collection_name=COLLECTION_NAME,
+        embedding_function=embeddings
+    )
     print(f"✅ Vector DB created with HuggingFace embeddings at {VECTOR_DB_PATH}")
     return vectordb
 
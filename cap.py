@@ -3,66 +3,165 @@ from argopy import gdacfs
 import pandas as pd
 import numpy as np
 import xarray as xr
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
 import warnings
-warnings.filterwarnings('ignore')
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+# Silence only the noisy libraries, not every warning in the process (a scoped
+# catch_warnings() would race across the worker threads in process_multiple_floats)
+warnings.filterwarnings('ignore', module=r'(argopy|xarray|fsspec)(\.|$)')
+
+GDAC_URL = "https://data-argo.ifremer.fr"
+GDAC_CACHE_DIR = os.path.join(tempfile.gettempdir(), "argo")
+ZARR_CACHE_DIR = os.path.join(GDAC_CACHE_DIR, "zarr")
+ZARR_PROFILE_CHUNK = 32
+ZARR_REVALIDATE_SECONDS = 86400  # how often to HEAD a prof.nc whose listing has no size/date
+PREVIEW_ROWS = 1000
+# Outputs land where db_setup.py loads data/<table> from, so one run refreshes all three tables
+DATA_DIR = "data"
+FLOATS_CSV = os.path.join(DATA_DIR, "floats.csv")
+CYCLES_CSV = os.path.join(DATA_DIR, "cycles.csv")
+MEASUREMENTS_PARQUET = os.path.join(DATA_DIR, "measurements.parquet")
+
+# Column types of the measurements table, as read_csv_auto inferred them from the old CSV:
+# BIGINT ids (cycles/floats join on FLOAT_ID), BIGINT QC flags, DOUBLE values
+_MEASUREMENT_VALUES = ['PRES', 'TEMP', 'PSAL', 'DOXY']
+MEASUREMENT_SCHEMA = pa.schema(
+    [('FLOAT_ID', pa.int64()), ('PROFILE_NUMBER', pa.int64()), ('LEVEL', pa.int64())]
+    + [(f"{v}{suffix}", pa.float64() if not suffix.endswith('_QC') else pa.int64())
+       for v in _MEASUREMENT_VALUES for suffix in ('', '_QC', '_ADJUSTED', '_ADJUSTED_QC')]
+)
+
+def _clean_text(text):
+    text = text.replace('\x00', '').strip()
+    return None if text == '' or text.lower() == 'nan' else text
 
 def safe_extract_scalar(data_array):
-    """Safely extract scalar values from xarray DataArray"""
+    """Safely extract scalar values from xarray DataArray (dispatch on dtype kind)"""
     try:
         if data_array is None:
             return None
         
-        value = data_array.values
+        values = data_array.values
+        kind = values.dtype.kind
         
-        # Handle different data types
-        if hasattr(value, 'item'):
-            value = value.item()
+        # Fixed-width byte strings / char arrays: one C-level join + decode
+        if kind == 'S':
+            return _clean_text(values.tobytes().decode('utf-8', 'replace'))
+        if kind == 'U':
+            return _clean_text(''.join(values.ravel().tolist()))
+        if kind == 'O' and values.size > 1:
+            # Object arrays of byte chunks: join in C, decode once
+            parts = values.ravel().tolist()
+            if all(isinstance(p, bytes) for p in parts):
+                return _clean_text(b''.join(parts).decode('utf-8', 'replace'))
         
-        # Convert bytes to string and clean
-        if isinstance(value, bytes):
-            value = value.decode('utf-8').strip()
-        elif isinstance(value, str):
-            value = value.strip()
-        elif isinstance(value, (np.ndarray, list)) and len(value) > 0:
-            if isinstance(value[0], bytes):
-                # Join byte arrays and decode
-                value = ''.join([b.decode('utf-8') if isinstance(b, bytes) else str(b) for b in value]).strip()
-            elif len(value) == 1:
-                value = value[0]
-        
-        # Handle NaN and empty values
-        if pd.isna(value) or (isinstance(value, str) and (value == '' or value.lower() == 'nan')):
+        if values.size != 1:
             return None
-            
+        
+        if kind == 'f':
+            x = float(values)
+            return None if x != x else x
+        if kind == 'M':
+            return None if np.isnat(values) else pd.Timestamp(values[()])
+        
+        value = values.item()
+        if isinstance(value, bytes):
+            return _clean_text(value.decode('utf-8', 'replace'))
+        if isinstance(value, str):
+            return _clean_text(value)
         return value
     except Exception:
         return None
 
-def safe_extract_array_value(data_array, indices):
-    """Safely extract single value from multidimensional array"""
+def load_decoded_array(data_array):
+    """Materialize a variable as a plain ndarray, decoding fixed-width byte strings once
+
+    Blank flags (' ' fill) come back as None, not '', so they stay null downstream.
+    """
+    values = data_array.values
+    if values.dtype.kind == 'S':
+        values = np.char.strip(np.char.decode(values, 'utf-8', 'replace')).astype(object)
+        values[values == ''] = None
+    return values
+
+# Listing fields that change when a GDAC file is rewritten (local: mtime, FTP: modify, S3: ETag)
+_STAMP_KEYS = ("size", "mtime", "modify", "LastModified", "ETag", "Last-Modified")
+
+def _stamp(info):
+    return {k: info[k] for k in _STAMP_KEYS if info.get(k) is not None}
+
+def _head_stamp(fs, path):
+    """Stamp from one HEAD request, or None when the GDAC is unreachable"""
     try:
-        if data_array is None:
-            return None
-            
-        value = data_array.values[indices]
-        
-        # Handle scalar results
-        if np.isscalar(value):
-            if isinstance(value, bytes):
-                decoded = value.decode('utf-8').strip()
-                return decoded if decoded else None
-            elif pd.isna(value):
-                return None
-            else:
-                return float(value) if isinstance(value, (np.floating, float)) else value
-        
-        return value
+        return _stamp(fs.info(path)) or None
     except Exception:
         return None
 
+def open_prof_dataset(fs, float_id, prof_file_path, listing_entry=None):
+    """Open prof.nc through a local chunked Zarr copy, reconverting when the remote file changes
+
+    `fs` should be an uncached gdacfs: the Zarr store is the prof.nc cache, and reading
+    through a download cache could convert a stale copy. `listing_entry` is the file's
+    entry from check_float_exists' directory listing, reused to detect changes.
+    """
+    zarr_path = os.path.join(ZARR_CACHE_DIR, f"{float_id}_prof.zarr")
+    stamp_path = f"{zarr_path}.source.json"
+    stamp = _stamp(listing_entry or {})
+    cached_stamp = None
+    if os.path.exists(zarr_path) and os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            cached_stamp = json.load(f)
+
+    if cached_stamp is not None:
+        if not stamp:
+            # HTTPS listings carry no size or date: HEAD the file, at most once per period
+            if time.time() - os.path.getmtime(stamp_path) < ZARR_REVALIDATE_SECONDS:
+                return xr.open_zarr(zarr_path)
+            stamp = _head_stamp(fs, prof_file_path)
+            if stamp is None:
+                return xr.open_zarr(zarr_path)  # offline: keep the copy on disk
+        if stamp == cached_stamp:
+            os.utime(stamp_path)
+            return xr.open_zarr(zarr_path)
+    elif not stamp:
+        stamp = _head_stamp(fs, prof_file_path)
+
+    with fs.open_dataset(prof_file_path) as ds:
+        # Chunk along profiles only so a max_profiles read touches just the first chunks
+        encoding = {
+            v: {'chunks': (ZARR_PROFILE_CHUNK,) + ds[v].shape[1:]}
+            for v in ds.data_vars if ds[v].dims[:1] == ('N_PROF',)
+        }
+        # Write aside and rename so an interrupted run never leaves a half store
+        os.makedirs(ZARR_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{zarr_path}.tmp-{threading.get_ident()}"
+        try:
+            ds.to_zarr(tmp_path, mode='w', encoding=encoding)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+    # Stamp goes first and comes back last: a crash in between means a reconvert, never a stale hit
+    if os.path.exists(stamp_path):
+        os.remove(stamp_path)
+    shutil.rmtree(zarr_path, ignore_errors=True)
+    os.replace(tmp_path, zarr_path)
+    if stamp is not None:
+        with open(f"{stamp_path}.tmp", "w") as f:
+            json.dump(stamp, f)
+        os.replace(f"{stamp_path}.tmp", stamp_path)
+    return xr.open_zarr(zarr_path)
+
 def extract_float_metadata(fs, float_id, dac="coriolis"):
     """Extract float metadata from meta.nc file"""
-    print(f"  📋 Extracting metadata for float {float_id}...")
+    tqdm.write(f"  📋 Extracting metadata for float {float_id}...")
     
     meta_file_path = f"dac/{dac}/{float_id}/{float_id}_meta.nc"
     
@@ -77,6 +176,9 @@ def extract_float_metadata(fs, float_id, dac="coriolis"):
                 'OPERATING_INSTITUTION', 'DATA_CENTRE', 'WMO_INST_TYPE'
             ]
             
+            # One bulk read of the fields we need instead of lazy per-variable pulls
+            ds_meta = ds_meta[[f for f in metadata_fields if f in ds_meta.variables]].load()
+            
             float_metadata = {'FLOAT_ID': float_id}
             
             for field in metadata_fields:
@@ -86,31 +188,28 @@ def extract_float_metadata(fs, float_id, dac="coriolis"):
                 else:
                     float_metadata[field] = None
         
-        print(f"    ✅ Metadata extracted")
+        tqdm.write(f"    ✅ Metadata extracted")
         return float_metadata
         
     except Exception as e:
-        print(f"    ❌ Error extracting metadata: {e}")
+        tqdm.write(f"    ❌ Error extracting metadata: {e}")
         # Return empty metadata record so processing continues
         return {'FLOAT_ID': float_id, **{field: None for field in metadata_fields if 'field' in locals()}}
 
-def extract_profile_and_measurement_data(fs, float_id, dac="coriolis", max_profiles=10):
+def extract_profile_and_measurement_data(fs, float_id, dac="coriolis", max_profiles=10, listing_entry=None):
     """Extract both profile info and measurements from prof.nc file"""
-    print(f"  🌊 Extracting data from prof.nc for float {float_id}...")
+    tqdm.write(f"  🌊 Extracting data from prof.nc for float {float_id}...")
     
     prof_file_path = f"dac/{dac}/{float_id}/{float_id}_prof.nc"
     
     try:
-        with fs.open_dataset(prof_file_path) as ds_prof:
-            n_profiles = ds_prof.dims.get('N_PROF', 0)
-            n_levels = ds_prof.dims.get('N_LEVELS', 0)
+        with open_prof_dataset(fs, float_id, prof_file_path, listing_entry) as ds_prof:
+            n_profiles = ds_prof.sizes.get('N_PROF', 0)
+            n_levels = ds_prof.sizes.get('N_LEVELS', 0)
             
             # Limit profiles to process
             profiles_to_process = min(n_profiles, max_profiles)
-            print(f"    📊 Processing {profiles_to_process}/{n_profiles} profiles, {n_levels} levels each")
-            
-            profile_data = []
-            measurements = []
+            tqdm.write(f"    📊 Processing {profiles_to_process}/{n_profiles} profiles, {n_levels} levels each")
             
             # Profile-level variables (1D arrays indexed by N_PROF)
             profile_vars = {
@@ -152,140 +251,182 @@ def extract_profile_and_measurement_data(fs, float_id, dac="coriolis", max_profi
                 })
                 profile_vars['PROFILE_DOXY_QC'] = 'profile_oxygen_qc'
             
-            # Process each profile
-            for prof_idx in range(profiles_to_process):
-                # Extract profile-level information
-                profile_info = {
-                    'FLOAT_ID': float_id,
-                    'PROFILE_NUMBER': prof_idx + 1
-                }
-                
-                for var_name, col_name in profile_vars.items():
-                    if var_name in ds_prof.variables:
-                        value = safe_extract_array_value(ds_prof[var_name], prof_idx)
-                        profile_info[var_name] = value
-                    else:
-                        profile_info[var_name] = None
-                
-                profile_data.append(profile_info)
-                
-                # Extract measurements for this profile
-                profile_measurements = 0
-                for level_idx in range(n_levels):
-                    # Check if this level has pressure data (skip if not)
-                    if 'PRES' in ds_prof.variables:
-                        pres_val = safe_extract_array_value(ds_prof['PRES'], (prof_idx, level_idx))
-                        if pres_val is None or pd.isna(pres_val):
-                            continue  # Skip levels without pressure data
-                    else:
-                        continue
-                    
-                    # Create measurement record
-                    measurement_row = {
-                        'FLOAT_ID': float_id,
-                        'PROFILE_NUMBER': prof_idx + 1,
-                        'LEVEL': level_idx + 1,
-                        'PRES': pres_val
-                    }
-                    
-                    # Extract other measurement variables
-                    for var_name, col_name in measurement_vars.items():
-                        if var_name == 'PRES':  # Already handled above
-                            continue
-                            
-                        if var_name in ds_prof.variables:
-                            value = safe_extract_array_value(ds_prof[var_name], (prof_idx, level_idx))
-                            measurement_row[var_name] = value
-                        else:
-                            measurement_row[var_name] = None
-                    
-                    measurements.append(measurement_row)
-                    profile_measurements += 1
-                
-                print(f"    📈 Profile {prof_idx + 1}: {profile_measurements} measurements")
+            # One bulk read of the needed variables instead of lazy per-variable pulls
+            needed_vars = [v for v in {**profile_vars, **measurement_vars} if v in ds_prof.variables]
+            ds_prof = ds_prof[needed_vars].load()
+            
+            # Pull every variable out of xarray once; the loops below only touch ndarrays
+            prof_arrays = {v: load_decoded_array(ds_prof[v]) for v in profile_vars if v in ds_prof.variables}
+            meas_arrays = {v: load_decoded_array(ds_prof[v]) for v in measurement_vars if v in ds_prof.variables}
+            
+            # Profile info column-wise too: one slice per variable instead of a dict per profile
+            profile_cols = {
+                'FLOAT_ID': np.full(profiles_to_process, float_id, dtype=object),
+                'PROFILE_NUMBER': np.arange(1, profiles_to_process + 1),
+            }
+            for var_name in profile_vars:
+                if var_name in prof_arrays:
+                    profile_cols[var_name] = prof_arrays[var_name][:profiles_to_process]
+                else:
+                    profile_cols[var_name] = np.full(profiles_to_process, None, dtype=object)
+            
+            # Extract measurements column-wise: flatten (profile, level) grids and keep
+            # only levels that have pressure data
+            n_cells = profiles_to_process * n_levels
+            flat_arrays = {v: arr[:profiles_to_process].ravel() for v, arr in meas_arrays.items()}
+            if 'PRES' in flat_arrays:
+                valid = ~np.isnan(flat_arrays['PRES'])
+            else:
+                valid = np.zeros(n_cells, dtype=bool)
+            # Resolve the mask to flat indices once; every column is then a single
+            # take() and profile/level numbers fall out of divmod, no full grids built
+            valid_idx = np.flatnonzero(valid)
+            n_valid = len(valid_idx)
+            prof_idx, level_idx = np.divmod(valid_idx, n_levels) if n_levels else (valid_idx, valid_idx)
+            
+            measurement_cols = {
+                'FLOAT_ID': np.full(n_valid, float_id, dtype=object),
+                'PROFILE_NUMBER': prof_idx + 1,
+                'LEVEL': level_idx + 1,
+            }
+            for var_name in measurement_vars:
+                if var_name in flat_arrays:
+                    measurement_cols[var_name] = flat_arrays[var_name].take(valid_idx)
+                else:
+                    measurement_cols[var_name] = np.full(n_valid, None, dtype=object)
         
-        print(f"    ✅ Extracted {len(profile_data)} profiles, {len(measurements)} measurements")
-        return profile_data, measurements
+        tqdm.write(f"    ✅ Extracted {profiles_to_process} profiles, {n_valid} measurements")
+        return profile_cols, measurement_cols
         
     except Exception as e:
-        print(f"    ❌ Error extracting data: {e}")
-        return [], []
+        tqdm.write(f"    ❌ Error extracting data: {e}")
+        return {}, {}
+
+def column_length(cols):
+    """Row count of a column dict (0 for an empty dict)"""
+    return len(next(iter(cols.values()), ()))
+
+def concat_columns(parts):
+    """Merge per-float column dicts into one column dict with a single np.concatenate per column.
+
+    Columns missing from a float (e.g. DOXY) are filled with None for its rows.
+    """
+    parts = [cols for cols in parts if column_length(cols)]
+    names = list(dict.fromkeys(name for cols in parts for name in cols))
+    return {
+        name: np.concatenate([
+            cols[name] if name in cols else np.full(column_length(cols), None, dtype=object)
+            for cols in parts
+        ])
+        for name in names
+    }
 
 def check_float_exists(fs, float_id, dac="coriolis"):
-    """Check if float files exist"""
-    files_to_check = [
-        f"dac/{dac}/{float_id}/{float_id}_meta.nc",
-        f"dac/{dac}/{float_id}/{float_id}_prof.nc"
-    ]
+    """Check if float files exist (one directory listing instead of a request per file)
+
+    Returns (any found, {file name: listing entry}) so callers can reuse the entries.
+    """
+    files_to_check = [f"{float_id}_meta.nc", f"{float_id}_prof.nc"]
     
-    existing_files = []
-    for file_path in files_to_check:
-        try:
-            fs.info(file_path)
-            existing_files.append(file_path.split('/')[-1])
-        except:
-            pass
+    try:
+        entries = {e['name'].rstrip('/').split('/')[-1]: e
+                   for e in fs.ls(f"dac/{dac}/{float_id}/", detail=True)}
+    except Exception:
+        return False, {}
     
+    existing_files = {f: entries[f] for f in files_to_check if f in entries}
     return len(existing_files) > 0, existing_files
 
-def process_multiple_floats(float_ids, dac="coriolis", max_profiles=10):
+def process_multiple_floats(float_ids, dac="coriolis", max_profiles=10, max_workers=8):
     """Process multiple floats and extract all data"""
     print(f"🚀 ARGO DATA EXTRACTION STARTED")
     print(f"📊 Target: {len(float_ids)} floats, up to {max_profiles} profiles each")
     print("=" * 80)
     
-    # Initialize file system
-    fs = gdacfs("https://data-argo.ifremer.fr")
+    # Initialize file system (local on-disk cache so reruns skip the downloads)
+    fs = gdacfs(GDAC_URL, cache=True, cachedir=GDAC_CACHE_DIR)
+    # prof.nc is cached as Zarr instead (see open_prof_dataset), so read it uncached
+    prof_fs = gdacfs(GDAC_URL)
     
     # Storage for all data
     all_float_metadata = []
-    all_profile_data = []
-    all_measurements = []
+    profile_parts = []
+    measurement_parts = []
     
-    # Process each float
-    for i, float_id in enumerate(float_ids, 1):
-        print(f"\n🌊 PROCESSING FLOAT {i}/{len(float_ids)}: {float_id}")
-        print("-" * 60)
+    # Workers log through tqdm.write: it serializes output and redraws the progress bar
+    # below it, where a plain print from 8 threads would tear through the bar
+    def process_one(i, float_id):
+        """Check, then extract metadata/profiles/measurements for one float (None on failure)"""
+        tqdm.write(f"\n🌊 PROCESSING FLOAT {i}/{len(float_ids)}: {float_id}\n" + "-" * 60)
         
         # Check if float exists
         exists, available_files = check_float_exists(fs, float_id, dac)
         if not exists:
-            print(f"  ❌ Float {float_id} not found or no accessible files")
-            continue
+            tqdm.write(f"  ❌ Float {float_id} not found or no accessible files")
+            return None
         
-        print(f"  📁 Available files: {', '.join(available_files)}")
+        tqdm.write(f"  📁 Available files: {', '.join(available_files)}")
         
         try:
             # Extract float metadata
             float_metadata = extract_float_metadata(fs, float_id, dac)
-            all_float_metadata.append(float_metadata)
             
             # Extract profile and measurement data
-            profile_data, measurements = extract_profile_and_measurement_data(fs, float_id, dac, max_profiles)
-            all_profile_data.extend(profile_data)
-            all_measurements.extend(measurements)
+            profile_data, measurements = extract_profile_and_measurement_data(
+                prof_fs, float_id, dac, max_profiles, available_files.get(f"{float_id}_prof.nc")
+            )
             
-            print(f"  ✅ Float {float_id} complete: {len(profile_data)} profiles, {len(measurements)} measurements")
+            tqdm.write(f"  ✅ Float {float_id} complete: {column_length(profile_data)} profiles, {column_length(measurements)} measurements")
+            return float_metadata, profile_data, measurements
             
         except Exception as e:
-            print(f"  ❌ Error processing float {float_id}: {e}")
-            continue
+            tqdm.write(f"  ❌ Error processing float {float_id}: {e}")
+            return None
+    
+    # Floats are independent and the work is HTTPS-bound, so fetch them concurrently
+    # (one shared fsspec filesystem; reads are thread-safe). map() keeps input order.
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        results = ex.map(process_one, range(1, len(float_ids) + 1), float_ids)
+        for result in tqdm(results, total=len(float_ids), desc="floats"):
+            if result is None:
+                continue
+            float_metadata, profile_data, measurements = result
+            all_float_metadata.append(float_metadata)
+            profile_parts.append(profile_data)
+            measurement_parts.append(measurements)
+    
+    # One concatenation per column at the end instead of growing lists of row dicts
+    # Measurements go straight from ndarrays to Arrow, never through a DataFrame
+    all_profile_data = pd.DataFrame(concat_columns(profile_parts))
+    # from_pandas=True: NaN fill values become nulls, so DuckDB aggregates skip them;
+    # the cast pins every column to MEASUREMENT_SCHEMA (string ids/QC flags, all-null columns)
+    measurement_cols = concat_columns(measurement_parts)
+    schema = pa.schema([MEASUREMENT_SCHEMA.field(name) for name in measurement_cols])
+    all_measurements = pa.Table.from_pydict({
+        name: pa.array(col, from_pandas=True).cast(schema.field(name).type)
+        for name, col in measurement_cols.items()
+    }, schema=schema)
     
     return all_float_metadata, all_profile_data, all_measurements
 
+def save_csv_preview(df, path, n_rows=None):
+    """Write the first rows of a large table as CSV for quick inspection"""
+    df.head(n_rows or PREVIEW_ROWS).to_csv(path, index=False)
+
 def save_to_csv_files(all_float_metadata, all_profile_data, all_measurements):
-    """Save extracted data to well-formatted CSV files"""
-    print(f"\n💾 SAVING DATA TO CSV FILES")
+    """Save floats/profiles as CSV and measurements as Parquet under data/ (plus a CSV preview)"""
+    print(f"\n💾 SAVING DATA FILES")
     print("=" * 80)
     
     files_created = []
+    os.makedirs(DATA_DIR, exist_ok=True)
     
-    # Save FLOAT.csv
+    # Save floats
     if all_float_metadata:
         df_floats = pd.DataFrame(all_float_metadata)
-        df_floats.to_csv("FLOAT.csv", index=False)
-        files_created.append(f"FLOAT.csv ({len(df_floats)} floats)")
-        print(f"✅ FLOAT.csv saved: {len(df_floats)} floats")
+        df_floats.to_csv(FLOATS_CSV, index=False)
+        files_created.append(f"{FLOATS_CSV} ({len(df_floats)} floats)")
+        print(f"✅ {FLOATS_CSV} saved: {len(df_floats)} floats")
         
         # Show sample
         print("   Sample data:")
@@ -294,12 +435,12 @@ def save_to_csv_files(all_float_metadata, all_profile_data, all_measurements):
         if available_cols:
             print(df_floats[available_cols].head(3).to_string(index=False))
     
-    # Save PROFILES.csv  
-    if all_profile_data:
-        df_profiles = pd.DataFrame(all_profile_data)
-        df_profiles.to_csv("PROFILES.csv", index=False)
-        files_created.append(f"PROFILES.csv ({len(df_profiles)} profiles)")
-        print(f"\n✅ PROFILES.csv saved: {len(df_profiles)} profiles")
+    # Save profiles (the cycles table)
+    if len(all_profile_data):
+        df_profiles = all_profile_data
+        df_profiles.to_csv(CYCLES_CSV, index=False)
+        files_created.append(f"{CYCLES_CSV} ({len(df_profiles)} profiles)")
+        print(f"\n✅ {CYCLES_CSV} saved: {len(df_profiles)} profiles")
         
         # Show sample
         print("   Sample data:")
@@ -308,12 +449,16 @@ def save_to_csv_files(all_float_metadata, all_profile_data, all_measurements):
         if available_cols:
             print(df_profiles[available_cols].head(3).to_string(index=False))
     
-    # Save MEASUREMENTS.csv
-    if all_measurements:
-        df_measurements = pd.DataFrame(all_measurements)
-        df_measurements.to_csv("MEASUREMENTS.csv", index=False)
-        files_created.append(f"MEASUREMENTS.csv ({len(df_measurements)} measurements)")
-        print(f"\n✅ MEASUREMENTS.csv saved: {len(df_measurements)} measurements")
+    # Save measurements as Parquet (columnar + zstd; the full table is far too big for CSV)
+    if len(all_measurements):
+        pq.write_table(all_measurements, MEASUREMENTS_PARQUET, compression="zstd")
+        files_created.append(f"{MEASUREMENTS_PARQUET} ({len(all_measurements)} measurements)")
+        print(f"\n✅ {MEASUREMENTS_PARQUET} saved: {len(all_measurements)} measurements")
+        
+        # Only the preview rows are converted to pandas
+        df_measurements = all_measurements.slice(0, PREVIEW_ROWS).to_pandas()
+        save_csv_preview(df_measurements, "MEASUREMENTS_preview.csv")
+        files_created.append(f"MEASUREMENTS_preview.csv (first {len(df_measurements)} rows)")
         
         # Show sample
         print("   Sample data:")
@@ -365,7 +510,7 @@ def main():
         print(f"   📄 {file_info}")
     
     print(f"\n💡 Next steps:")
-    print(f"   - Check the CSV files for data quality")
+    print(f"   - Check the CSV / Parquet files for data quality")
     print(f"   - Import into your analysis software")
     print(f"   - Use FLOAT_ID as foreign key to link tables")
 
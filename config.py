@@ -9,5 +9,7 @@ load_dotenv()  # by default, looks for .env in current directory
 GEN_API_KEY = os.getenv("GOOGLE_API_KEY")
 DUCKDB_PATH = os.getenv("DUCKDB_PATH")
 VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH")
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "4GB")
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "16"))  # keep in step with gunicorn --threads
 
 
@@ -1,29 +1,80 @@
+import os
+import sys
 import duckdb
-import pandas as pd
 from config import DUCKDB_PATH
 
+# Named ocean regions as (lat_min, lat_max, lon_min, lon_max) boxes, tagged onto cycles at load
+REGION_BOXES = {
+    "arabian": (5, 25, 45, 78),
+}
+
+
+def _table_source(name):
+    """DuckDB scan expression for data/<name>: Parquet if present, else the CSV
+
+    DuckDB scans the files itself, so no Arrow/pandas copy is materialized in Python.
+    Which file was picked is printed, and a CSV shadowed by the Parquet is called out.
+    """
+    parquet_path = f"data/{name}.parquet"
+    csv_path = f"data/{name}.csv"
+    if os.path.exists(parquet_path):
+        if os.path.exists(csv_path):
+            print(f"⚠️ {csv_path} is ignored in favour of {parquet_path}; delete one to silence this")
+        print(f"📄 {name} <- {parquet_path}")
+        return f"read_parquet('{parquet_path}')"
+    print(f"📄 {name} <- {csv_path}")
+    return f"read_csv_auto('{csv_path}', parallel=true)"
+
+
+def add_cycle_regions(con):
+    """Tag each cycle with its region once, so region lookups filter one indexed column"""
+    cases = " ".join(
+        f"WHEN LATITUDE BETWEEN {lat_min} AND {lat_max} AND LONGITUDE BETWEEN {lon_min} AND {lon_max} THEN '{name}'"
+        for name, (lat_min, lat_max, lon_min, lon_max) in REGION_BOXES.items()
+    )
+    con.execute("ALTER TABLE cycles ADD COLUMN IF NOT EXISTS region VARCHAR")
+    con.execute(f"UPDATE cycles SET region = CASE {cases} END")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_cycles_region ON cycles(region)")
+
+
+def has_cycle_regions(con):
+    """True if cycles already carries the region column (DBs built before it existed don't)"""
+    return con.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_name = 'cycles' AND column_name = 'region'
+    """).fetchone()[0] > 0
+
 
 def load_csvs_to_duckdb():
     con = duckdb.connect(DUCKDB_PATH)
     print("shaari")
-    # Load CSVs into DuckDB
-    df_measurements = pd.read_csv("data/measurements.csv")
-    df_cycles = pd.read_csv("data/cycles.csv")
-    df_floats = pd.read_csv("data/floats.csv")
-    
-    con.execute("CREATE OR REPLACE TABLE measurements AS SELECT * FROM df_measurements")
+    # Load CSVs into DuckDB (DuckDB's multithreaded reader, no pandas round-trip)
+    con.execute(f"CREATE OR REPLACE TABLE measurements AS SELECT * FROM {_table_source('measurements')}")
     print("shankar")
-    con.execute("CREATE OR REPLACE TABLE cycles AS SELECT * FROM df_cycles")
-    con.execute("CREATE OR REPLACE TABLE floats AS SELECT * FROM df_floats")
+    con.execute(f"CREATE OR REPLACE TABLE cycles AS SELECT * FROM {_table_source('cycles')}")
+    con.execute(f"CREATE OR REPLACE TABLE floats AS SELECT * FROM {_table_source('floats')}")
+    add_cycle_regions(con)
     
     print("✅ CSVs loaded into DuckDB successfully!")
     return con
 
+def migrate_duckdb():
+    """Upgrade an existing DB in place (e.g. one loaded before cycles had a region column)"""
+    con = duckdb.connect(DUCKDB_PATH)
+    if not has_cycle_regions(con):
+        print("🔄 Tagging cycle regions...")
+        add_cycle_regions(con)
+    print(f"✅ {DUCKDB_PATH} is up to date")
+    return con
+
 def query_db(con, sql):
     df = con.execute(sql).df()
     return df
 
 if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        migrate_duckdb().close()
+        sys.exit()
     con = load_csvs_to_duckdb()
     
     # Optional: test query
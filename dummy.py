@@ -1,2 +1,4 @@
 from sentence_transformers import SentenceTransformer
-SentenceTransformer("sentence-transformers/all-mpnet-base-v2", cache_folder="./hf_models", local_files_only=True)
+SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", cache_folder="./hf_models")
+SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", cache_folder="./hf_models",
+                    backend="onnx", model_kwargs={"file_name": "onnx/model_quint8_avx2.onnx"})
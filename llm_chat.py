@@ -1,159 +1,472 @@
 # llm_chat.py
 import os
+import sys
+import json
+import atexit
+import functools
+import threading
 import duckdb
 import re
+import numpy as np
+import torch
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from langchain_huggingface import HuggingFaceEmbeddings
 try:
     from langchain_chroma import Chroma
 except ImportError:
     from langchain_community.vectorstores import Chroma
-from build_vectordb import build_vector_db
-from db_setup import load_csvs_to_duckdb, query_db
+from build_vectordb import (
+    build_vector_db, load_flat_index, built_with_model,
+    COLLECTION_NAME, EMBEDDING_MODEL_NAME, ONNX_QUANTIZED_FILE
+)
+from db_setup import load_csvs_to_duckdb, query_db, has_cycle_regions
 import google.generativeai as genai
 from langchain_core.prompts import ChatPromptTemplate
-from config import GEN_API_KEY, DUCKDB_PATH, VECTOR_DB_PATH
+from langchain_core.documents import Document
+from config import GEN_API_KEY, DUCKDB_PATH, VECTOR_DB_PATH, DUCKDB_MEMORY_LIMIT, SERVER_THREADS
 
 
 # --- 1️⃣ Configure Gemini ---
 if not GEN_API_KEY:
     raise ValueError("❌ No Gemini API Key found in config.py")
 genai.configure(api_key=GEN_API_KEY)
+_GEMINI = genai.GenerativeModel("gemini-2.5-flash")  # built once; requests don't share state
 
 
 # --- 2️⃣ DuckDB Connection ---
+# The chat process only reads; use every core for the occasional big aggregation
+_READ_CONFIG = {"threads": os.cpu_count() or 1, "memory_limit": DUCKDB_MEMORY_LIMIT}
+
+
+def _open_read_only():
+    return duckdb.connect(DUCKDB_PATH, read_only=True, config=_READ_CONFIG)
+
+
 def get_db_connection():
-    return duckdb.connect(DUCKDB_PATH)
+    """Cursor on the shared read-only connection (one per caller/thread, same catalog)."""
+    return _CON.cursor()
 
 
 def initialize_database():
     if not os.path.exists(DUCKDB_PATH):
         print("🔄 DuckDB database not found. Loading CSVs...")
-        return load_csvs_to_duckdb()
+        load_csvs_to_duckdb().close()  # writer connection only lives for the load
     else:
         print(f"✅ DuckDB database found at {DUCKDB_PATH}")
-        return get_db_connection()
+    con = _open_read_only()
+    if not has_cycle_regions(con):
+        # Never migrate here: every worker imports this module, and they'd race for the writer lock
+        print("⚠️ cycles has no region column; run `python db_setup.py migrate` to add it")
+    return con
 
 
-con_init = initialize_database()
-con_init.close()
+_CON = initialize_database()
+
+
+def _lazy(factory):
+    """Build on first call (once, even across threads), then keep returning the same object."""
+    cached = functools.cache(factory)
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get():
+        with lock:
+            return cached()
+    return get
 
 
 # --- 3️⃣ Embedding Model (Retriever brain 🧠) ---
-embedding_model = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-mpnet-base-v2",
-    cache_folder="./hf_models",
-    model_kwargs={"local_files_only": True}
-)
+# Model, vector DB and memory load on first use, not at import
+if torch.cuda.is_available():
+    # GPU: PyTorch weights in fp16 (tensor cores, half the activation memory)
+    _embed_kwargs = {
+        "local_files_only": True,
+        "device": "cuda",
+        "model_kwargs": {"torch_dtype": torch.float16},
+    }
+else:
+    # CPU: ONNX Runtime + int8 weights, 2-4x faster embed_query than eager PyTorch
+    _embed_kwargs = {
+        "local_files_only": True,
+        "backend": "onnx",
+        "model_kwargs": {"file_name": ONNX_QUANTIZED_FILE},
+    }
+
+@_lazy
+def get_embedding_model():
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        cache_folder="./hf_models",
+        model_kwargs=_embed_kwargs,
+        # Unit vectors out of the encoder, as the cosine/IP indexes expect
+        encode_kwargs={"normalize_embeddings": True, "batch_size": 64}
+    )
 
 
 # --- 4️⃣ Build or Load Vector DB ---
-if not os.path.exists(VECTOR_DB_PATH):
-    print("🔄 Vector DB not found. Building vector DB...")
-    vectordb = build_vector_db(embedding_model=embedding_model)
-else:
+@_lazy
+def get_vectordb():
+    embedding_model = get_embedding_model()
+    if built_with_model() != EMBEDDING_MODEL_NAME:
+        print("🔄 Vector DB missing or built with another embedding model. Building vector DB...")
+        return build_vector_db(embedding_model=embedding_model, con=get_db_connection())
     print(f"✅ Loading existing Vector DB from {VECTOR_DB_PATH}")
-    vectordb = Chroma(persist_directory=VECTOR_DB_PATH, embedding_function=embedding_model)
+    return Chroma(
+        persist_directory=VECTOR_DB_PATH,
+        collection_name=COLLECTION_NAME,
+        embedding_function=embedding_model
+    )
 
-retriever = vectordb.as_retriever(search_kwargs={"k": 5})
+
+@_lazy
+def get_flat_index():
+    """Exact in-memory search when the flat sidecar exists (None: use Chroma HNSW)"""
+    get_vectordb()  # builds the sidecar too if the DB is missing
+    return load_flat_index(get_embedding_model())
+
+
+def search_cycles(question, k=5, embedding=None):
+    if embedding is None:
+        embedding = get_embedding_model().embed_query(question)
+    flat_index = get_flat_index()
+    if flat_index is not None:
+        return flat_index.similarity_search_by_vector(embedding, k=k)
+    return get_vectordb().similarity_search_by_vector(embedding, k=k)
 
 
 # --- 5️⃣ Memory Store ---
-MEMORY_DB_PATH = "memory_chroma"
-memory_store = Chroma(persist_directory=MEMORY_DB_PATH, embedding_function=embedding_model)
+class FlatMemory:
+    """Conversation memory as an exact inner-product index over normalized vectors.
+
+    A few thousand past answers don't need HNSW; a matrix product is faster and
+    adds are plain appends (raw float32 vectors + a JSONL sidecar), no sqlite.
+    Every gunicorn worker opens the same files, so appends and trims hold an flock
+    and each worker picks up the others' rows before it searches.
+    """
+
+    def __init__(self, path, embedding):
+        self.embedding = embedding
+        self._vec_path = os.path.join(path, "vectors.f32")
+        self._doc_path = os.path.join(path, "docs.jsonl")
+        self._dim_path = os.path.join(path, "dim")
+        self._lock_path = os.path.join(path, "lock")
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        self.docs = []
+        self.matrix = None
+        self.dim = None
+        self._doc_end = 0  # bytes of docs.jsonl already in self.docs
+        with self._locked():
+            self._sync()
+
+    @contextmanager
+    def _locked(self):
+        """This process's thread lock plus an flock shared with the other workers"""
+        with self._lock, open(self._lock_path, "a") as f:
+            if fcntl is not None:  # no fcntl on Windows, where the dev server is one process
+                fcntl.flock(f, fcntl.LOCK_EX)  # released when f closes
+            yield
+
+    def _sync(self):
+        """Load rows appended since the last sync and cut back debris from a crashed append.
+
+        Call with the lock held: every append happens under it, so rows one file has
+        and the other doesn't can only be left over from a worker that died mid-append.
+        """
+        if self.dim is None and os.path.exists(self._dim_path):
+            with open(self._dim_path) as f:
+                self.dim = int(f.read())
+        new_docs, doc_ends = [], []
+        if os.path.exists(self._doc_path):
+            with open(self._doc_path, "rb") as f:
+                f.seek(self._doc_end)
+                offset = self._doc_end
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # torn last line
+                    new_docs.append(json.loads(line))
+                    offset += len(line)
+                    doc_ends.append(offset)
+        rows = 0
+        if self.dim and os.path.exists(self._vec_path):
+            rows = os.path.getsize(self._vec_path) // (4 * self.dim)
+
+        k = max(min(rows, len(self.docs) + len(new_docs)) - len(self.docs), 0)
+        if k:
+            with open(self._vec_path, "rb") as f:
+                f.seek(len(self.docs) * 4 * self.dim)
+                vecs = np.fromfile(f, dtype=np.float32, count=k * self.dim).reshape(k, self.dim)
+            # docs before matrix: a concurrent search snapshots matrix first, then docs
+            self.docs = self.docs + new_docs[:k]
+            self.matrix = vecs if self.matrix is None else np.vstack([self.matrix, vecs])
+            self._doc_end = doc_ends[k - 1]
+        if os.path.exists(self._vec_path):
+            os.truncate(self._vec_path, len(self.docs) * 4 * (self.dim or 0))
+        if os.path.exists(self._doc_path):
+            os.truncate(self._doc_path, self._doc_end)
+
+    def _behind(self):
+        """True if vectors.f32 holds rows this process hasn't loaded (or debris to trim)"""
+        try:
+            size = os.path.getsize(self._vec_path)
+        except OSError:
+            return False
+        return size != len(self.docs) * 4 * (self.dim or 0)
+
+    def add_texts(self, texts, metadatas=None, embeddings=None):
+        texts = list(texts)
+        if embeddings is None:
+            embeddings = self.embedding.embed_documents(texts)
+        vecs = np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms == 0, 1.0, norms)
+        docs = [{"text": t, "metadata": m or {}} for t, m in zip(texts, metadatas or [None] * len(texts))]
+        data = "".join(json.dumps(d) + "\n" for d in docs).encode("utf-8")
+
+        with self._locked():
+            self._sync()  # append after the other workers' rows, not over them
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                with open(self._dim_path, "w") as f:
+                    f.write(str(self.dim))
+            # Docs first, so a crash between the appends leaves a spare doc that the next sync drops
+            with open(self._doc_path, "ab") as f:
+                f.write(data)
+            with open(self._vec_path, "ab") as f:
+                vecs.tofile(f)
+            self._doc_end += len(data)
+            self.docs = self.docs + docs
+            self.matrix = vecs if self.matrix is None else np.vstack([self.matrix, vecs])
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        if self._behind():
+            with self._locked():
+                self._sync()
+        matrix, docs = self.matrix, self.docs  # rows of this snapshot are all in docs
+        if matrix is None:
+            return []
+        q = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        scores = matrix @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Document(page_content=docs[i]["text"], metadata=docs[i]["metadata"]) for i in top]
+
+    def similarity_search(self, query, k=4):
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k)
+
+
+MEMORY_DB_PATH = "memory_flat_minilm"  # per-model path: memory vectors must match embedding dims
+
+
+@_lazy
+def get_memory_store():
+    return FlatMemory(MEMORY_DB_PATH, get_embedding_model())
+
+
+# Answers are queued and embedded in batches (one embed_documents call per flush)
+MEMORY_FLUSH_SIZE = 16
+MEMORY_FLUSH_SECONDS = 5.0
+_MEM_QUEUE = []
+_MEM_LOCK = threading.Lock()
+_mem_timer = None
+
+
+def _flush_memory():
+    """Write every queued answer to the memory store in one batch."""
+    global _mem_timer
+    with _MEM_LOCK:
+        batch = _MEM_QUEUE[:]
+        _MEM_QUEUE.clear()
+        if _mem_timer is not None:
+            _mem_timer.cancel()
+            _mem_timer = None
+    if batch:
+        try:
+            get_memory_store().add_texts([t for t, _ in batch], metadatas=[m for _, m in batch])
+        except:
+            pass
+
+
+def remember(answer, question):
+    """Queue an answer for memory; flushes at MEMORY_FLUSH_SIZE or after MEMORY_FLUSH_SECONDS."""
+    global _mem_timer
+    with _MEM_LOCK:
+        _MEM_QUEUE.append((answer, {"question": question}))
+        full = len(_MEM_QUEUE) >= MEMORY_FLUSH_SIZE
+        if not full and _mem_timer is None:
+            _mem_timer = threading.Timer(MEMORY_FLUSH_SECONDS, _flush_memory)
+            _mem_timer.daemon = True
+            _mem_timer.start()
+    return full
 
 
 # --- 6️⃣ Session Context ---
-session_context = {
-    "current_float_id": None,
-    "current_region": None,
-    "current_parameter": None,
-    "recent_queries": []
-}
+RECENT_QUERY_LIMIT = 5
+
+
+@dataclass(slots=True)
+class SessionState:
+    """What one conversation is currently about (one instance per session id)."""
+    current_float_id: str | None = None
+    current_region: str | None = None
+    current_parameter: str | None = None
+    recent_queries: deque = field(default_factory=lambda: deque(maxlen=RECENT_QUERY_LIMIT))
+
+
+# Most recently used sessions; the oldest is forgotten past MAX_SESSIONS
+MAX_SESSIONS = 1024
+SESSIONS: OrderedDict[str, SessionState] = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(session_id="default"):
+    """Session state for an id, created on first use."""
+    with _SESSIONS_LOCK:
+        state = SESSIONS.get(session_id)
+        if state is None:
+            state = SESSIONS[session_id] = SessionState()
+            if len(SESSIONS) > MAX_SESSIONS:
+                SESSIONS.popitem(last=False)
+        else:
+            SESSIONS.move_to_end(session_id)
+    return state
+
+
+_FLOAT_RE = re.compile(r"\b(\d{7})\b")
+_REGION_KEYWORDS = ["arctic", "pacific", "atlantic", "indian", "southern", "mediterranean", "arabian"]
+_PARAM_KEYWORDS = ["temperature", "salinity", "pressure", "depth", "oxygen", "chlorophyll", "ph"]
+_TAG_KIND = {**dict.fromkeys(_REGION_KEYWORDS, "region"), **dict.fromkeys(_PARAM_KEYWORDS, "parameter")}
+
+
+def _plural_pattern(word):
+    """Named group matching a keyword or its plural (salinity/salinities, depth/depths)"""
+    stem = word[:-1] + "(?:y|ies)" if word.endswith("y") else word + "s?"
+    return f"(?P<{word}>{stem})"
+
+
+# One alternation tags region + parameter in a single pass over the text;
+# the matching group's name is the base keyword, so plurals tag the same as singulars
+_TAG_RE = re.compile(r"\b(?:" + "|".join(map(_plural_pattern, _TAG_KIND)) + r")\b", re.IGNORECASE)
 
 
 def extract_entities(text):
     """Detect float ID, region, parameter from user text."""
     entities = {}
 
-    float_match = re.search(r"\b(\d{7})\b", text)
+    float_match = _FLOAT_RE.search(text)
     if float_match:
         entities["float_id"] = float_match.group(1)
 
-    region_keywords = ["arctic", "pacific", "atlantic", "indian", "southern", "mediterranean", "arabian"]
-    for r in region_keywords:
-        if r in text.lower():
-            entities["region"] = r
-            break
-
-    param_keywords = ["temperature", "salinity", "pressure", "depth", "oxygen", "chlorophyll", "ph"]
-    for p in param_keywords:
-        if p in text.lower():
-            entities["parameter"] = p
+    for match in _TAG_RE.finditer(text):
+        word = match.lastgroup
+        entities.setdefault(_TAG_KIND[word], word)
+        if "region" in entities and "parameter" in entities:
             break
 
     return entities
 
 
+# One round trip per question: every fact is a tagged row of the same shape
+# (tag, count, cycle_number, latitude, longitude, date).
+# A NULL $fid simply makes the float legs return no rows.
+_SQL_FACTS = """
+    WITH tot AS (
+        SELECT COUNT(DISTINCT platform_number) AS n FROM floats
+    ), ex AS (
+        SELECT COUNT(*) AS n FROM floats WHERE platform_number = $fid
+    ), lc AS (
+        SELECT cycle_number, latitude, longitude, JULD AS date
+        FROM cycles
+        WHERE FLOAT_ID = $fid
+        ORDER BY cycle_number DESC, JULD DESC LIMIT 1
+    )
+    SELECT 'tot' AS tag, n, NULL AS cycle_number, NULL AS latitude, NULL AS longitude,
+           NULL AS date FROM tot
+    UNION ALL SELECT 'ex', n, NULL, NULL, NULL, NULL FROM ex
+    UNION ALL SELECT 'lc', NULL, cycle_number, latitude, longitude, date FROM lc
+"""
+
+# Region membership is fixed at load time, so the per-region samples are too
+_SQL_REGION_SAMPLES = """
+    SELECT c.region, list(DISTINCT f.platform_number ORDER BY f.platform_number)[1:5]
+    FROM floats f JOIN cycles c ON f.FLOAT_ID=c.FLOAT_ID
+    WHERE c.region IS NOT NULL
+    GROUP BY c.region
+"""
+_REGION_LABELS = {"arabian": "Arabian Sea"}
+
+
+@_lazy
+def get_region_samples():
+    """region -> first 5 platform numbers seen there (one query per process)"""
+    rows = get_db_connection().execute(_SQL_REGION_SAMPLES).fetchall()
+    return {region: [str(p) for p in ids] for region, ids in rows}
+
+
 def query_db_facts(question, entities):
     con = get_db_connection()
     facts = []
     try:
+        fid = entities.get("float_id")
+        # Columnar Arrow result instead of per-cell Python tuple conversion
+        rows = con.execute(_SQL_FACTS, {"fid": fid}).fetch_arrow_table().to_pylist()
+        tagged = {}
+        for row in rows:
+            tagged.setdefault(row["tag"], []).append(row)
+
         # Total floats
-        res = con.execute("SELECT COUNT(DISTINCT platform_number) FROM floats").fetchone()
-        facts.append(f"Database contains {res[0]} unique floats.")
+        facts.append(f"Database contains {tagged['tot'][0]['n']} unique floats.")
 
         # Float ID check
-        if "float_id" in entities:
-            fid = entities["float_id"]
-            exists = con.execute("SELECT COUNT(*) FROM floats WHERE platform_number = ?", [fid]).fetchone()[0]
-            if exists > 0:
+        if fid is not None:
+            if tagged["ex"][0]["n"] > 0:
                 facts.append(f"Float {fid} exists in the database.")
-                # ✅ Now pull latest cycle info
-                loc = con.execute("""
-                    SELECT cycle_number, latitude, longitude, date
-                    FROM cycles
-                    WHERE platform_number = ?
-                    ORDER BY cycle_number DESC LIMIT 1
-                """, [fid]).fetchone()
-                if loc:
-                    facts.append(f"Last cycle {loc[0]} at {loc[1]:.2f}°N, {loc[2]:.2f}°E on {loc[3]}.")
+                # ✅ Latest cycle info
+                if "lc" in tagged:
+                    lc = tagged["lc"][0]
+                    facts.append(f"Last cycle {lc['cycle_number']} at {lc['latitude']:.2f}°N, "
+                                 f"{lc['longitude']:.2f}°E on {lc['date']}.")
                 else:
                     facts.append(f"No cycle records found for float {fid}.")
             else:
                 facts.append(f"Float {fid} not found in database.")
 
-        # Region check...
-        if entities.get("region") == "arabian":
-            res = con.execute("""
-                SELECT DISTINCT f.platform_number 
-                FROM floats f JOIN cycles c ON f.platform_number=c.platform_number
-                WHERE c.latitude BETWEEN 5 AND 25 
-                AND c.longitude BETWEEN 45 AND 78
-                LIMIT 5
-            """).fetchall()
-            if res:
-                ids = [str(r[0]) for r in res]
-                facts.append(f"Sample floats in Arabian Sea: {', '.join(ids)}.")
+        # Region check (precomputed samples, no query)
+        region = entities.get("region")
+        if region in _REGION_LABELS:
+            ids = get_region_samples().get(region)
+            if ids:
+                facts.append(f"Sample floats in {_REGION_LABELS[region]}: {', '.join(ids)}.")
+            else:
+                facts.append(f"No sample floats found in {_REGION_LABELS[region]}.")
 
     except Exception as e:
         # ⚠️ Don't hide errors, surface them for debugging
         facts.append(f"DATABASE ERROR: {repr(e)}")
         print(f"\n[DB ERROR] {e}\n")
-    finally:
-        con.close()
 
     return "\n".join(facts)
 
 
-def update_context(question):
+def update_context(question, state, ents=None):
     """Update active session context."""
-    global session_context
-    ents = extract_entities(question)
+    if ents is None:
+        ents = extract_entities(question)
     for k, v in ents.items():
-        session_context[f"current_{k}"] = v
-    session_context["recent_queries"].append(question)
-    if len(session_context["recent_queries"]) > 5:
-        session_context["recent_queries"].pop(0)
+        setattr(state, f"current_{k}", v)
+    state.recent_queries.append(question)  # deque(maxlen) evicts the oldest in O(1)
 
 
 # --- 7️⃣ System Prompt ---
@@ -179,42 +492,137 @@ prompt_template = ChatPromptTemplate.from_messages(
 
 
 # --- 8️⃣ Ask LLM (Gemini as reasoning + voice 🗣️) ---
+# Prompt budget for retrieved text (Gemini prefill time scales with input length)
+_MAX_CHARS_PER_DOC = 800
+_MAX_TOTAL_CHARS = 4000
+
+
+def pack_docs(docs):
+    """Deduplicated, per-doc trimmed page contents that fit the total prompt budget."""
+    seen = set()
+    packed = []
+    total = 0
+    for d in docs:
+        key = hash(d.page_content[:200])  # memory hits often repeat a retrieved doc
+        if key in seen:
+            continue
+        seen.add(key)
+        text = d.page_content[:_MAX_CHARS_PER_DOC]
+        if total + len(text) > _MAX_TOTAL_CHARS:
+            break
+        packed.append(text)
+        total += len(text)
+    return packed
+
+
 def ask_llm(question, db_facts, docs):
-    doc_context = "\n".join([d.page_content for d in docs]) if docs else "No retrieved docs."
+    """Stream the answer: yields text chunks as Gemini produces them."""
+    texts = pack_docs(docs)
+    doc_context = "\n".join(texts) if texts else "No retrieved docs."
     full_context = f"=== DATABASE FACTS ===\n{db_facts}\n\n=== RETRIEVED DOCS ===\n{doc_context}"
     prompt_text = prompt_template.format(context=full_context, question=question)
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt_text)
-    return response.text.strip()
+    for chunk in _GEMINI.generate_content(prompt_text, stream=True):
+        yield chunk.text
 
 
 # --- 9️⃣ Hybrid Answer (DB + RAG + LLM) ---
-def hybrid_answer(question):
+# Cycle and memory searches are independent; run them side by side.
+# Two legs per request thread, so concurrent chats never queue behind each other
+_RETRIEVE_POOL = ThreadPoolExecutor(max_workers=2 * SERVER_THREADS)
+# Memory flushes get their own single writer and never hold up retrieval
+_MEMORY_POOL = ThreadPoolExecutor(max_workers=1)
+atexit.register(_MEMORY_POOL.shutdown)  # let queued memory writes finish on exit
+atexit.register(_flush_memory)  # atexit is LIFO: runs first, writes any partial batch
+
+
+def stream_answer(question, state=None, embedding=None):
+    """Yield answer chunks as they arrive; session + memory are updated once it completes.
+
+    Pass `embedding` when the caller already embedded the question (e.g. for a cache lookup).
+    """
+    if state is None:
+        state = get_session()
+
+    # Embed the question once; both stores share the embedding model
+    qvec = embedding
+    if qvec is None:
+        try:
+            qvec = get_embedding_model().embed_query(question)
+        except:
+            qvec = None
+
+    futures = []
+    if qvec is not None:
+        futures = [
+            _RETRIEVE_POOL.submit(search_cycles, question, embedding=qvec),
+            _RETRIEVE_POOL.submit(lambda: get_memory_store().similarity_search_by_vector(qvec, k=2)),
+        ]
+
     ents = extract_entities(question)
     db_facts = query_db_facts(question, ents)
 
     # Vector + memory retrieval
     docs = []
-    try:
-        docs += retriever.get_relevant_documents(question)
-    except:
-        pass
-    try:
-        docs += memory_store.similarity_search(question, k=2)
-    except:
-        pass
-
-    # Get final LLM answer
-    answer = ask_llm(question, db_facts, docs)
+    for future in futures:
+        try:
+            docs += future.result()
+        except:
+            pass
+
+    # Stream the LLM answer, keeping the full text for context + memory
+    parts = []
+    for text in ask_llm(question, db_facts, docs):
+        parts.append(text)
+        yield text
+    answer = "".join(parts).strip()
 
     # Update session
-    update_context(question)
+    update_context(question, state, ents)
+    # Embedding + persisting the answer happens off the reply path, batched
     try:
-        memory_store.add_texts([answer], metadatas=[{"question": question}])
+        if remember(answer, question):
+            _MEMORY_POOL.submit(_flush_memory)
     except:
         pass
 
+
+# Recent answers keyed by question + the session context it was asked in
+_ANSWER_CACHE_SIZE = 128
+_ANSWER_CACHE = OrderedDict()
+_ANSWER_LOCK = threading.Lock()
+_TIME_SENSITIVE_RE = re.compile(r"\b(latest|now|today|current|recent)\b", re.IGNORECASE)
+
+
+def is_time_sensitive(question):
+    """Questions whose answer may change between asks; never served from a cache."""
+    return _TIME_SENSITIVE_RE.search(question) is not None
+
+
+def hybrid_answer(question, state=None, embedding=None):
+    """Full answer as one string (web handler, caches)."""
+    if state is None:
+        state = get_session()
+
+    key = None
+    if not is_time_sensitive(question):
+        key = (question.strip().lower(), state.current_float_id, state.current_region, state.current_parameter)
+        with _ANSWER_LOCK:
+            cached = _ANSWER_CACHE.get(key)
+            if cached is not None:
+                _ANSWER_CACHE.move_to_end(key)
+        if cached is not None:
+            update_context(question, state)  # the session still moves on
+            return cached
+
+    answer = "".join(stream_answer(question, state, embedding)).strip()
+
+    if key is not None:
+        with _ANSWER_LOCK:
+            _ANSWER_CACHE[key] = answer
+            _ANSWER_CACHE.move_to_end(key)
+            if len(_ANSWER_CACHE) > _ANSWER_CACHE_SIZE:
+                _ANSWER_CACHE.popitem(last=False)
     return answer
 
 
@@ -225,8 +633,11 @@ if __name__ == "__main__":
         q = input("\n❓ Ask your question (type 'exit' to quit): ")
         if q.lower() in ["exit", "quit"]:
             break
-        ans = hybrid_answer(q)
-        print("\n💡 Response:\n", ans)
+        print("\n💡 Response:\n ", end="", flush=True)
+        for text in stream_answer(q):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        print()
 
 '''
 import os
@@ -0,0 +1,9 @@
+# wsgi.py - production entry point for the Flask app
+# Run with: gunicorn -k gthread -w 2 --threads 16 --timeout 120 wsgi:app
+# (set SERVER_THREADS to match if you change --threads; it sizes the retrieval pool)
+# Threads, not gevent: Gemini goes over gRPC (not made cooperative by monkey-patching)
+# and embedding / DuckDB work is native code that releases the GIL.
+from app import app
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000)